@@ -7,16 +7,17 @@ from Crewhu notification JSON, and updates the ticket's custom field.
 """
 
 import csv
-import json
 import re
-import requests
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 from connectwise_api import (
+    MAX_WORKERS,
     require_credentials,
-    get_headers,
+    get_session,
     tickets_url
 )
+from json_utils import iter_json_items
 
 # ==========
 # CONFIG
@@ -31,6 +32,9 @@ JSON_FILE = Path("crewhu_notifications_NEW.json")
 # ==========
 # STEP 1: LOAD CSV TICKETS
 # ==========
+# Ticket IDs, including float-formatted ones like "497225.0"
+TICKET_ID_PATTERN = re.compile(r"^\s*(\d+)(?:\.\d+)?\s*$")
+
 def load_ticket_numbers_from_csv(csv_path):
     ticket_numbers = set()
 
@@ -42,26 +46,28 @@ def load_ticket_numbers_from_csv(csv_path):
         except csv.Error:
             dialect = csv.get_dialect("excel")
 
-        reader = csv.DictReader(f, dialect=dialect)
+        reader = csv.reader(f, dialect=dialect)
+        header = next(reader, [])
 
         possible_ticket_keys = ["Ticket#", "Ticket", "Ticket #", "ticket", "ticket#"]
 
+        # The header is the same for every row, so pick the ticket column once
+        ticket_key = next((key for key in possible_ticket_keys if key in header), None)
+        if ticket_key is None:
+            return []
+        col_idx = header.index(ticket_key)
+
         for row in reader:
-            ticket_value = None
-            for key in possible_ticket_keys:
-                if key in row and row[key]:
-                    ticket_value = row[key]
-                    break
+            if col_idx >= len(row):
+                continue
 
+            ticket_value = row[col_idx]
             if not ticket_value:
                 continue
 
-            ticket_value = str(ticket_value).strip()
-            # Handle things like "497225.0"
-            ticket_value = ticket_value.split(".")[0]
-
-            if ticket_value.isdigit():
-                ticket_numbers.add(ticket_value)
+            match = TICKET_ID_PATTERN.match(ticket_value)
+            if match:
+                ticket_numbers.add(match.group(1))
 
     return sorted(ticket_numbers, key=int)
 
@@ -70,85 +76,103 @@ def load_ticket_numbers_from_csv(csv_path):
 # STEP 2: LOAD JSON NOTIFICATIONS
 # ==========
 def load_notifications_from_json(json_path):
-    with json_path.open("r", encoding="utf-8") as f:
-        data = json.load(f)
-    return data  # expecting a list of dicts
+    """Yield notification records (dicts) one at a time from the JSON export."""
+    with json_path.open("rb") as f:
+        yield from iter_json_items(f)
 
 
 # ==========
-# STEP 3: EXTRACT SURVEY LINK FOR A TICKET
+# STEP 3: INDEX SURVEY LINKS BY TICKET
 # ==========
 SURVEY_LINK_PATTERN = re.compile(
     r"https://web\.crewhu\.com/#/managesurvey/form/[^\s<>\"']+"
 )
+TICKET_REF_PATTERN = re.compile(r"ticket#\s*(\d+)")
 
-def get_survey_link_for_ticket(ticket_number, notifications):
+def build_ticket_link_index(notifications):
     """
-    Find the first Crewhu survey link for a given ticket number.
-    We look for:
+    Build a {ticket_number: survey_link} map in a single pass over the notifications.
+    For each notification we look for:
       - 'ticket# {ticket_number}' in FullBody/full_clean_body
       - and a link containing '.../managesurvey/form/...'
+    The first link found for a ticket wins.
     """
-    ticket_pattern = f"ticket# {ticket_number}"
+    index = {}
 
     for notif in notifications:
         # Support both raw (FullBody) and processed (full_clean_body) formats
         full_body = notif.get("FullBody", "") or notif.get("full_clean_body", "")
-        if ticket_pattern not in full_body:
+
+        # Cheap substring checks first - most bodies fail here and skip the regexes
+        if "ticket#" not in full_body or "/managesurvey/form/" not in full_body:
+            continue
+
+        ticket_match = TICKET_REF_PATTERN.search(full_body)
+        if not ticket_match:
             continue
 
-        match = SURVEY_LINK_PATTERN.search(full_body)
-        if match:
-            link = match.group(0).rstrip(">.")  # trim any trailing markup chars
-            return link
+        link_match = SURVEY_LINK_PATTERN.search(full_body)
+        if link_match:
+            link = link_match.group(0).rstrip(">.")  # trim any trailing markup chars
+            index.setdefault(ticket_match.group(1), link)
 
-    return None
+    return index
 
 
 # ==========
-# STEP 4: UPDATE CONNECTWISE TICKET FIELD
+# STEP 4: FIND THE CREWHU FIELD INDEX (ONCE PER TENANT)
 # ==========
-def update_ticket_crewhu_field(ticket_number, survey_link, headers):
+def find_crewhu_field_index(custom_fields):
     """
-    For a given ConnectWise ticket:
-      - GET the ticket
-      - Find the 'Latest Crewhu Survey' custom field (or any field with 'crewhu' in caption)
-      - PATCH its value to survey_link
+    Return the index of the 'Latest Crewhu Survey' custom field (or any field
+    with 'crewhu' in caption), or -1 if there is none.
     """
-    ticket_id = int(ticket_number)
-    url = tickets_url(ticket_id)
+    # Take the last Crewhu-related field ('Latest Crewhu Survey' contains 'crewhu' too),
+    # scanning from the end so we can stop at the first hit
+    return next(
+        (i for i in range(len(custom_fields) - 1, -1, -1)
+         if "crewhu" in (custom_fields[i].get("caption") or "").lower()),
+        -1,
+    )
 
-    # --- GET the ticket ---
-    resp = requests.get(url, headers=headers)
-    if resp.status_code != 200:
-        print(f"[{ticket_number}] GET ticket failed: {resp.status_code} {resp.text[:200]}")
-        return False
 
-    ticket = resp.json()
-    custom_fields = ticket.get("customFields", [])
+def get_crewhu_field_index(session):
+    """
+    Look up the Crewhu custom field index from a single ticket.
+    Every ticket in the tenant shares the same customFields layout, so this
+    index is valid for all of them and no per-ticket GET is needed.
+    Returns -1 if it can't be determined.
+    """
+    params = {"fields": "id,customFields", "pageSize": 1}
+
+    resp = session.get(tickets_url(), params=params)
+    if resp.status_code != 200:
+        print(f"GET tickets failed: {resp.status_code} {resp.text[:200]}")
+        return -1
 
-    if not custom_fields:
-        print(f"[{ticket_number}] No customFields on ticket.")
-        return False
+    tickets = resp.json()
+    if not tickets:
+        print("No tickets returned to read the customFields layout from.")
+        return -1
 
-    # Find the Crewhu field (prefer explicit caption, otherwise any 'crewhu'-related)
-    candidates = [
-        f for f in custom_fields
-        if f.get("caption", "").strip().lower() == "latest crewhu survey"
-        or "crewhu" in f.get("caption", "").lower()
-    ]
+    return find_crewhu_field_index(tickets[0].get("customFields") or [])
 
-    if not candidates:
-        print(f"[{ticket_number}] No Crewhu-related custom field found.")
-        return False
 
-    latest_field = candidates[-1]
-    idx = custom_fields.index(latest_field)
+# ==========
+# STEP 5: UPDATE CONNECTWISE TICKET FIELD
+# ==========
+def update_ticket_crewhu_field(ticket_number, survey_link, field_idx, session):
+    """
+    For a given ConnectWise ticket:
+      - PATCH the Crewhu custom field (at field_idx) to survey_link
+    """
+    ticket_id = int(ticket_number)
+    url = tickets_url(ticket_id)
 
     patch_body = [
         {
             "op": "replace",
-            "path": f"/customFields/{idx}/value",
+            "path": f"/customFields/{field_idx}/value",
             "value": survey_link,
         }
     ]
@@ -157,7 +181,7 @@ def update_ticket_crewhu_field(ticket_number, survey_link, headers):
         print(f"[{ticket_number}] (DRY RUN) Would update field to: {survey_link}")
         return True
 
-    patch_resp = requests.patch(url, headers=headers, json=patch_body)
+    patch_resp = session.patch(url, json=patch_body)
 
     if patch_resp.status_code in (200, 204):
         print(f"[{ticket_number}] Updated Crewhu field with: {survey_link}")
@@ -174,7 +198,7 @@ def main():
     # Validate credentials
     require_credentials()
 
-    headers = get_headers()
+    session = get_session()
 
     # Check files exist
     if not CSV_FILE.exists():
@@ -189,9 +213,9 @@ def main():
     tickets = load_ticket_numbers_from_csv(CSV_FILE)
     print(f"Found {len(tickets)} tickets in CSV")
 
-    print("Loading Crewhu JSON notifications...")
-    notifications = load_notifications_from_json(JSON_FILE)
-    print(f"Loaded {len(notifications)} notification records from JSON.")
+    print("Indexing Crewhu JSON notifications...")
+    link_index = build_ticket_link_index(load_notifications_from_json(JSON_FILE))
+    print(f"Found survey links for {len(link_index)} tickets.")
 
     if DRY_RUN:
         print("\n!!! DRY RUN MODE - No changes will be made !!!\n")
@@ -200,9 +224,10 @@ def main():
     missing_link = 0
     errors = 0
 
+    # Resolve survey links up front (local work only)
+    pending = []
     for ticket_number in tickets:
-        print(f"\n=== Processing ticket {ticket_number} ===")
-        survey_link = get_survey_link_for_ticket(ticket_number, notifications)
+        survey_link = link_index.get(ticket_number)
 
         if not survey_link:
             print(f"[{ticket_number}] No Crewhu survey link found in JSON.")
@@ -210,10 +235,28 @@ def main():
             continue
 
         print(f"[{ticket_number}] Found survey link: {survey_link}")
-        if update_ticket_crewhu_field(ticket_number, survey_link, headers):
-            processed += 1
-        else:
-            errors += 1
+        pending.append((ticket_number, survey_link))
+
+    field_idx = get_crewhu_field_index(session)
+    if field_idx == -1:
+        print("ERROR: No Crewhu-related custom field found on tickets.")
+        return
+    print(f"\nCrewhu survey field is customFields[{field_idx}]")
+
+    # Update tickets in parallel - each ticket is an independent PATCH
+    print(f"Updating {len(pending)} tickets ({MAX_WORKERS} at a time)...")
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        results = executor.map(
+            lambda item: update_ticket_crewhu_field(
+                item[0], item[1], field_idx, session
+            ),
+            pending
+        )
+        for success in results:
+            if success:
+                processed += 1
+            else:
+                errors += 1
 
     print("\n" + "=" * 40)
     print("SUMMARY")
@@ -5,16 +5,18 @@ Reads parsed survey data from JSON and creates internal analysis notes
 on the corresponding tickets.
 """
 
-import json
-import requests
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
 from pathlib import Path
 
 from connectwise_api import (
+    MAX_WORKERS,
     require_credentials,
-    get_headers,
+    get_session,
+    is_automated_note,
     ticket_notes_url
 )
+from json_utils import load_json
 
 # ==============================
 # CONFIG
@@ -27,7 +29,7 @@ PARSED_JSON = Path("crewhu_surveys_clean.json")
 # ==============================
 # DELETE OLD AUTOMATED NOTES
 # ==============================
-def delete_automated_notes(ticket_id, headers):
+def delete_automated_notes(ticket_id, session):
     """
     Find and delete any existing notes created by this automation
     to prevent duplicates.
@@ -39,7 +41,11 @@ def delete_automated_notes(ticket_id, headers):
     notes_url = ticket_notes_url(ticket_id)
 
     try:
-        resp = requests.get(notes_url, headers=headers)
+        # Let ConnectWise filter down to survey notes instead of returning all of them,
+        # falling back to all notes if it rejects the condition
+        resp = session.get(notes_url, params={"conditions": 'text contains "Customer feedback:"'})
+        if resp.status_code == 400:
+            resp = session.get(notes_url)
         if resp.status_code != 200:
             print(f"[{ticket_id}] Failed to fetch notes: {resp.status_code}")
             return 0
@@ -52,9 +58,8 @@ def delete_automated_notes(ticket_id, headers):
             text = (note.get("text") or "")
 
             # Delete notes created by our script to prevent duplicates
-            if "just gave a" in text and "Customer feedback:" in text:
-                del_url = ticket_notes_url(ticket_id, note_id)
-                d = requests.delete(del_url, headers=headers)
+            if is_automated_note(text):
+                d = session.delete(f"{notes_url}/{note_id}")
                 if d.status_code in (200, 204):
                     print(f"[{ticket_id}] Deleted old auto note {note_id}")
                     deleted += 1
@@ -72,8 +77,8 @@ def delete_automated_notes(ticket_id, headers):
 # ==============================
 # POST NEW NOTE (INTERNAL)
 # ==============================
-def post_note(ticket_id, summary, feedback, headers):
-    """Post a new internal analysis note to a ticket."""
+def post_note(ticket_id, summary, feedback, date_created, session):
+    """Post a new internal analysis note to a ticket (date_created is an ISO timestamp)."""
     url = ticket_notes_url(ticket_id)
 
     # Construct the final note text
@@ -91,11 +96,11 @@ def post_note(ticket_id, summary, feedback, headers):
         "internalAnalysisFlag": True,    # True = Put in Internal Analysis
         "resolutionFlag": False,         # False = Do not put in Resolution
         "createdBy": "Crewhu API",
-        "dateCreated": datetime.now(timezone.utc).isoformat()
+        "dateCreated": date_created
     }
 
     try:
-        response = requests.post(url, headers=headers, json=payload)
+        response = session.post(url, json=payload)
 
         if response.status_code == 201:
             print(f"[{ticket_id}] Posted internal note")
@@ -108,6 +113,29 @@ def post_note(ticket_id, summary, feedback, headers):
         return False
 
 
+# ==============================
+# PROCESS ONE ENTRY
+# ==============================
+def process_entry(entry, date_created, session):
+    """
+    Replace the automation note on one ticket: delete old notes, then post
+    the new one. Returns True/False for posted/failed, or None if skipped.
+    """
+    ticket_id = entry.get("ticket_number")
+    summary = entry.get("summary", "").strip()
+    feedback = entry.get("customer_feedback", "No feedback provided.").strip()
+
+    if not ticket_id:
+        print("Skipping entry with missing ticket number.")
+        return None
+
+    # Delete old automated notes (prevents duplicates)
+    delete_automated_notes(ticket_id, session)
+
+    # Post the new note
+    return post_note(ticket_id, summary, feedback, date_created, session)
+
+
 # ==============================
 # MAIN
 # ==============================
@@ -115,15 +143,14 @@ def main():
     # Validate credentials
     require_credentials()
 
-    headers = get_headers()
+    session = get_session()
 
     if not PARSED_JSON.exists():
         print(f"ERROR: {PARSED_JSON} not found.")
         print("Please run reformatJSON.py first to generate this file.")
         return
 
-    with PARSED_JSON.open("r", encoding="utf-8") as f:
-        parsed_data = json.load(f)
+    parsed_data = load_json(PARSED_JSON)
 
     print(f"Loaded {len(parsed_data)} parsed Crewhu entries.")
 
@@ -134,25 +161,20 @@ def main():
     posted = 0
     errors = 0
 
-    for entry in parsed_data:
-        ticket_id = entry.get("ticket_number")
-        summary = entry.get("summary", "").strip()
-        feedback = entry.get("customer_feedback", "No feedback provided.").strip()
-
-        if not ticket_id:
-            print("Skipping entry with missing ticket number.")
-            continue
-
-        print(f"\n=== Processing ticket {ticket_id} ===")
-
-        # Delete old automated notes (prevents duplicates)
-        delete_automated_notes(ticket_id, headers)
-
-        # Post the new note
-        if post_note(ticket_id, summary, feedback, headers):
-            posted += 1
-        else:
-            errors += 1
+    # One timestamp for the whole run
+    date_created = datetime.now(timezone.utc).isoformat()
+
+    # Tickets are independent, so process several at a time
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        results = executor.map(
+            lambda entry: process_entry(entry, date_created, session),
+            parsed_data
+        )
+        for result in results:
+            if result is True:
+                posted += 1
+            elif result is False:
+                errors += 1
 
     # Summary
     print("\n" + "=" * 40)
@@ -6,12 +6,13 @@ custom field on matching tickets.
 """
 
 import csv
+import json
 import requests
 from pathlib import Path
 
 from connectwise_api import (
     require_credentials,
-    get_headers,
+    get_session,
     tickets_url
 )
 
@@ -38,11 +39,9 @@ RATING_MAP = {
 # ==========================================
 # UPDATE LOGIC
 # ==========================================
-def update_ticket_rating(ticket_id, rating_value, headers):
-    """Update the Latest Crewhu Rating custom field on a ticket."""
-    url = tickets_url(ticket_id)
-
-    payload = [
+def build_rating_payload(rating_value):
+    """Build the PATCH payload that sets the Latest Crewhu Rating custom field."""
+    return [
         {
             "op": "replace",
             "path": "customFields",
@@ -59,12 +58,24 @@ def update_ticket_rating(ticket_id, rating_value, headers):
         }
     ]
 
+
+# There are only a few distinct rating values, so serialize each PATCH body once
+PATCH_BODIES = {
+    value: json.dumps(build_rating_payload(value)).encode("utf-8")
+    for value in set(RATING_MAP.values())
+}
+
+
+def update_ticket_rating(ticket_id, rating_value, session):
+    """Update the Latest Crewhu Rating custom field on a ticket."""
+    url = tickets_url(ticket_id)
+
     if DRY_RUN:
         print(f"[{ticket_id}] (DRY RUN) Would set rating to: {rating_value}")
         return True
 
     try:
-        response = requests.patch(url, headers=headers, json=payload)
+        response = session.patch(url, data=PATCH_BODIES[rating_value])
 
         if response.status_code == 200:
             print(f"[{ticket_id}] Updated rating to: {rating_value}")
@@ -91,13 +102,17 @@ def main():
         print("Please update CSV_FILE path in the script.")
         return
 
-    headers = get_headers()
+    session = get_session()
 
-    # Load CSV using standard library
+    # Load CSV using standard library - keep only the two columns we use
     try:
         with CSV_FILE.open('r', encoding='utf-8-sig', newline='') as f:
-            reader = csv.DictReader(f)
-            rows = list(reader)
+            reader = csv.reader(f)
+            header = next(reader, [])
+            ticket_idx = header.index('Ticket#')
+            rating_idx = header.index('Rating')
+            last_idx = max(ticket_idx, rating_idx)
+            rows = [(row[ticket_idx], row[rating_idx]) for row in reader if len(row) > last_idx]
     except Exception as e:
         print(f"ERROR reading CSV: {e}")
         return
@@ -112,20 +127,24 @@ def main():
     skipped = 0
     errors = 0
 
-    # Process each row
-    for row in rows:
-        ticket_id = str(row.get('Ticket#', '')).strip()
-
-        # Handle float ticket IDs like "497225.0"
-        if '.' in ticket_id:
-            ticket_id = ticket_id.split('.')[0]
-
-        if not ticket_id or not ticket_id.isdigit():
-            print(f"Skipping row - Invalid ticket ID: {ticket_id}")
+    # Validate and map every row first, so the update loop below is network work only.
+    # Only the last rating per ticket matters, so each ticket is PATCHed once.
+    work = {}
+    for raw_ticket, raw_rating in rows:
+        # Parse the ticket ID, including float-formatted ones like "497225.0"
+        try:
+            ticket_num = int(float(raw_ticket))
+        except (ValueError, OverflowError):
+            ticket_num = 0
+
+        if ticket_num <= 0:
+            print(f"Skipping row - Invalid ticket ID: {raw_ticket.strip()}")
             skipped += 1
             continue
 
-        rating = str(row.get('Rating', '')).strip().upper()
+        ticket_id = str(ticket_num)
+
+        rating = raw_rating.strip().upper()
 
         # Map rating to value
         if rating not in RATING_MAP:
@@ -133,9 +152,15 @@ def main():
             skipped += 1
             continue
 
-        rating_value = RATING_MAP[rating]
+        if ticket_id in work:
+            print(f"[{ticket_id}] Earlier rating superseded by a later row")
+            skipped += 1
+
+        work[ticket_id] = RATING_MAP[rating]
 
-        if update_ticket_rating(ticket_id, rating_value, headers):
+    # Update each ticket
+    for ticket_id, rating_value in work.items():
+        if update_ticket_rating(ticket_id, rating_value, session):
             updated += 1
         else:
             errors += 1
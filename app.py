@@ -9,12 +9,23 @@ import os
 import json
 import queue
 import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 from datetime import datetime, timezone
+from operator import itemgetter
+from typing import Any, Dict, Optional
 from flask import Flask, render_template, request, jsonify, Response
 from werkzeug.utils import secure_filename
 from dotenv import load_dotenv
 
+from json_utils import iter_json_items, load_json, dump_json, dumps
+
+try:
+    import re2 as re_engine  # google-re2: linear-time matching, no backtracking
+except ImportError:
+    import re as re_engine
+
 load_dotenv()
 
 app = Flask(__name__)
@@ -24,8 +35,40 @@ app.config['UPLOAD_FOLDER'] = Path('uploads')
 # Ensure upload folder exists
 app.config['UPLOAD_FOLDER'].mkdir(exist_ok=True)
 
+# Background jobs run on a bounded pool; extra jobs wait for a free slot
+MAX_JOBS = int(os.environ.get("MAX_JOBS", 2))
+job_executor = ThreadPoolExecutor(max_workers=MAX_JOBS)
+
 # Global status queue for SSE
 status_queues = {}
+STATUS_QUEUE_SIZE = 1024  # max undelivered messages per session
+STATUS_MIN_INTERVAL = 0.1  # seconds between throttled progress updates per session
+STATUS_QUEUE_GRACE = 60  # seconds a finished job's queue waits for a stream to connect
+_last_status_ts = {}
+_open_streams = {}  # number of connected SSE streams per session
+_streams_lock = threading.Lock()
+
+# Sent when no status arrives for 30s so proxies keep the stream open
+_KEEPALIVE = b'data: {"type":"keepalive"}\n\n'
+
+
+# ==========================================
+# EMAIL PARSING PATTERNS (from reformatJSON.py)
+# ==========================================
+# Flags are inline so the patterns compile the same under re2 and re.
+# "Review" and "Woohoo" emails are matched by one alternation; group names are
+# suffixed _r/_w per branch and the suffix is dropped after matching.
+_REVIEW_PATTERN = (
+    r"(?P<customer_r>.*?) from (?P<company_r>.*?) gave a (?P<rating_r>.*?) rating to (?P<employee_r>.*?) for (?P<categories_r>.*?) on ticket# (?P<ticket_id_r>\d+)\s*\((?P<ticket_desc_r>.*?)\)"
+)
+_WOOHOO_PATTERN = (
+    r"(?P<customer_w>.*?) from (?P<company_w>.*?) gave a (?P<rating_w>.*?) Rating for (?P<categories_w>.*?) on ticket# (?P<ticket_id_w>\d+)\s*\((?P<ticket_desc_w>.*?)\) to your colleague (?P<employee_w>.+?)\.?$"
+)
+# (?m) so that $ matches at each line end when searching the whole body
+_REGEX_COMBINED = re_engine.compile(f"(?im)(?:{_REVIEW_PATTERN}|{_WOOHOO_PATTERN})")
+_REGEX_FEEDBACK = re_engine.compile(
+    r"(?is)Customer feedback:\s*(?:\"(?P<quote>.*?)\"|(?P<none>No feedback provided))"
+)
 
 
 # ==========================================
@@ -33,126 +76,163 @@ status_queues = {}
 # ==========================================
 def get_status_queue(session_id):
     """Get or create a status queue for a session."""
-    if session_id not in status_queues:
-        status_queues[session_id] = queue.Queue()
-    return status_queues[session_id]
+    q = status_queues.get(session_id)
+    if q is None:
+        # setdefault is atomic, so a POST route and a stream connecting at the
+        # same moment still end up sharing one queue
+        q = status_queues.setdefault(session_id, queue.Queue(maxsize=STATUS_QUEUE_SIZE))
+    return q
+
+
+def send_status(session_id, message, progress=None, status_type="info", throttle=False):
+    """
+    Send a status update to the client.
+    With throttle=True, "info" updates are sent at most every
+    STATUS_MIN_INTERVAL seconds per session; use it for per-item progress
+    in loops. If the client has fallen behind (or never connected) and the
+    queue is full, updates are dropped so the job never stalls; only the
+    final "success" and "done" messages wait briefly for room.
+    """
+    q = status_queues.get(session_id)
+    if q is None:
+        return
+
+    if throttle and status_type == "info":
+        now = time.monotonic()
+        if now - _last_status_ts.get(session_id, 0) < STATUS_MIN_INTERVAL:
+            return
+        _last_status_ts[session_id] = now
+
+    status = {
+        "message": message,
+        "progress": progress,
+        "type": status_type,
+        "timestamp": time.time()
+    }
 
+    try:
+        q.put_nowait(status)
+    except queue.Full:
+        if status_type in ("success", "done"):
+            try:
+                q.put(status, timeout=5)
+            except queue.Full:
+                pass
+
+
+def open_stream(session_id):
+    """Register a connected SSE stream and return the session's queue."""
+    with _streams_lock:
+        _open_streams[session_id] = _open_streams.get(session_id, 0) + 1
+        return get_status_queue(session_id)
+
+
+def cleanup_queue(session_id, q):
+    """
+    Clean up a session's queue when its last stream closes.
+    A stream that is still open (e.g. after an EventSource reconnect) keeps
+    the queue, and a queue that has since been replaced is left alone.
+    """
+    with _streams_lock:
+        remaining = _open_streams.get(session_id, 1) - 1
+        if remaining > 0:
+            _open_streams[session_id] = remaining
+            return
+        _open_streams.pop(session_id, None)
 
-def send_status(session_id, message, progress=None, status_type="info"):
-    """Send a status update to the client."""
-    if session_id in status_queues:
-        status_queues[session_id].put({
-            "message": message,
-            "progress": progress,
-            "type": status_type,
-            "timestamp": datetime.now().isoformat()
-        })
+        if status_queues.get(session_id) is q:
+            status_queues.pop(session_id, None)
+            _last_status_ts.pop(session_id, None)
 
 
-def cleanup_queue(session_id):
-    """Clean up a session's queue."""
-    if session_id in status_queues:
-        del status_queues[session_id]
+def drop_unread_queue(session_id, q):
+    """Remove a session's queue if no stream is reading it (e.g. the tab was closed)."""
+    with _streams_lock:
+        if _open_streams.get(session_id) or status_queues.get(session_id) is not q:
+            return
+        status_queues.pop(session_id, None)
+        _last_status_ts.pop(session_id, None)
 
 
 # ==========================================
 # IMPORT SCRIPTS (with status callbacks)
 # ==========================================
+def _extract_survey(subject: str, full_body: str) -> Optional[Dict[str, Any]]:
+    """Extract survey data from one email's subject and body. Returns dict or None."""
+    if 'rating' not in subject.lower() and 'gave a' not in full_body.lower():
+        return None
+
+    m = _REGEX_COMBINED.search(full_body)
+    if not m:
+        return None
+    match_data: Dict[str, str] = {k[:-2]: v for k, v in m.groupdict().items() if v is not None}
+
+    ticket_id_int: int = int(match_data['ticket_id'])
+
+    feedback_text: str = "No feedback provided."
+    fb_match = _REGEX_FEEDBACK.search(full_body)
+    if fb_match:
+        if fb_match.group('quote'):
+            feedback_text = fb_match.group('quote').strip()
+
+    summary_sentence: str = (
+        f"{match_data['customer'].strip()} from {match_data['company'].strip()} "
+        f"just gave a {match_data['rating'].strip()} rating to {match_data['employee'].strip().rstrip('.')} "
+        f"for {match_data['categories'].strip()} on ticket# {match_data['ticket_id']} "
+        f"({match_data['ticket_desc'].strip()})."
+    )
+
+    return {
+        "ticket_number": ticket_id_int,
+        "summary": summary_sentence,
+        "customer_feedback": feedback_text
+    }
+
+
 def run_reformat_json(input_file, output_file, session_id, dry_run=False):
     """Run the reformatJSON logic with status updates."""
-    import re
-
     send_status(session_id, "Starting JSON parsing...", 0)
 
-    # Regex patterns from reformatJSON.py
-    REGEX_REVIEW = re.compile(
-        r"(?P<customer>.*?) from (?P<company>.*?) gave a (?P<rating>.*?) rating to (?P<employee>.*?) for (?P<categories>.*?) on ticket# (?P<ticket_id>\d+)\s*\((?P<ticket_desc>.*?)\)",
-        re.IGNORECASE
-    )
-    REGEX_WOOHOO = re.compile(
-        r"(?P<customer>.*?) from (?P<company>.*?) gave a (?P<rating>.*?) Rating for (?P<categories>.*?) on ticket# (?P<ticket_id>\d+)\s*\((?P<ticket_desc>.*?)\) to your colleague (?P<employee>.+?)\.?$",
-        re.IGNORECASE
-    )
-    REGEX_FEEDBACK = re.compile(
-        r"Customer feedback:\s*(?:\"(?P<quote>.*?)\"|(?P<none>No feedback provided))",
-        re.IGNORECASE | re.DOTALL
-    )
+    surveys = {}
+    skipped = 0
+    total_emails = 0
 
     try:
-        with open(input_file, 'r', encoding='utf-8-sig') as f:
-            emails = json.load(f)
+        file_size = os.path.getsize(input_file) or 1
+        with open(input_file, 'rb') as f:
+            # Emails are stream-parsed one at a time; progress is how far into the file we are
+            for email in iter_json_items(f):
+                total_emails += 1
+
+                if total_emails % 10 == 1:
+                    progress = 10 + int((f.tell() / file_size) * 80)
+                    send_status(session_id, f"Processing email {total_emails}...", progress, throttle=True)
+
+                subject = email.get('Subject', '') or email.get('summary', '')
+                full_body = email.get('FullBody', '') or email.get('full_clean_body', '')
+
+                survey = _extract_survey(subject, full_body)
+                if survey is None:
+                    skipped += 1
+                    continue
+
+                # Exports are oldest first, so the last survey per ticket is the newest
+                surveys[survey["ticket_number"]] = survey
     except Exception as e:
         send_status(session_id, f"Error reading file: {e}", 100, "error")
         return {"success": False, "error": str(e)}
 
-    send_status(session_id, f"Loaded {len(emails)} emails", 10)
-
-    surveys = {}
-    skipped = 0
-
-    for i, email in enumerate(emails):
-        progress = 10 + int((i / len(emails)) * 80)
-
-        subject = email.get('Subject', '') or email.get('summary', '')
-        full_body = email.get('FullBody', '') or email.get('full_clean_body', '')
-
-        if 'rating' not in subject.lower() and 'gave a' not in full_body.lower():
-            skipped += 1
-            continue
-
-        match_data = None
-        cleaned_lines = [line.strip() for line in full_body.splitlines() if line.strip()]
-
-        for line in cleaned_lines:
-            m1 = REGEX_REVIEW.search(line)
-            if m1:
-                match_data = m1.groupdict()
-                break
-            m2 = REGEX_WOOHOO.search(line)
-            if m2:
-                match_data = m2.groupdict()
-                break
-
-        if not match_data:
-            skipped += 1
-            continue
-
-        ticket_id_int = int(match_data['ticket_id'])
-
-        feedback_text = "No feedback provided."
-        fb_match = REGEX_FEEDBACK.search(full_body)
-        if fb_match:
-            if fb_match.group('quote'):
-                feedback_text = fb_match.group('quote').strip()
-
-        summary_sentence = (
-            f"{match_data['customer'].strip()} from {match_data['company'].strip()} "
-            f"just gave a {match_data['rating'].strip()} rating to {match_data['employee'].strip().rstrip('.')} "
-            f"for {match_data['categories'].strip()} on ticket# {match_data['ticket_id']} "
-            f"({match_data['ticket_desc'].strip()})."
-        )
-
-        surveys[ticket_id_int] = {
-            "ticket_number": ticket_id_int,
-            "summary": summary_sentence,
-            "customer_feedback": feedback_text
-        }
-
-        if i % 10 == 0:
-            send_status(session_id, f"Processing email {i+1}/{len(emails)}...", progress)
-
-    sorted_data = sorted(surveys.values(), key=lambda x: x['ticket_number'])
+    sorted_data = sorted(surveys.values(), key=itemgetter('ticket_number'))
 
     if not dry_run:
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(sorted_data, f, indent=4)
+        dump_json(sorted_data, output_file)
 
-    send_status(session_id, f"Parsing complete! Extracted {len(sorted_data)} surveys, skipped {skipped}", 100, "success")
+    send_status(session_id, f"Parsing complete! Extracted {len(surveys)} surveys, skipped {skipped}", 100, "success")
 
     return {
         "success": True,
-        "total_emails": len(emails),
-        "surveys_extracted": len(sorted_data),
+        "total_emails": total_emails,
+        "surveys_extracted": len(surveys),
         "skipped": skipped,
         "dry_run": dry_run
     }
@@ -161,8 +241,7 @@ def run_reformat_json(input_file, output_file, session_id, dry_run=False):
 def run_post_ratings(csv_file, session_id, dry_run=True):
     """Run the POST_Ratings logic with status updates."""
     import csv
-    import requests
-    from connectwise_api import validate_credentials, get_headers, tickets_url
+    from connectwise_api import MAX_WORKERS, validate_credentials, get_session, tickets_url
 
     send_status(session_id, "Starting ratings update...", 0)
 
@@ -177,74 +256,107 @@ def run_post_ratings(csv_file, session_id, dry_run=True):
         "NEGATIVE": "Negative",
     }
 
-    try:
-        with open(csv_file, 'r', encoding='utf-8-sig', newline='') as f:
-            reader = csv.DictReader(f)
-            rows = list(reader)
-    except Exception as e:
-        send_status(session_id, f"Error reading CSV: {e}", 100, "error")
-        return {"success": False, "error": str(e)}
-
-    send_status(session_id, f"Loaded {len(rows)} rows from CSV", 10)
+    # Only a few distinct rating values, so serialize each PATCH body once per run
+    patch_bodies = {
+        value: json.dumps([{
+            "op": "replace",
+            "path": "customFields",
+            "value": [{
+                "id": 18,
+                "caption": "Latest Crewhu Rating",
+                "type": "Text",
+                "entryMethod": "EntryField",
+                "numberOfDecimals": 0,
+                "value": value
+            }]
+        }]).encode("utf-8")
+        for value in set(RATING_MAP.values())
+    }
 
-    headers = get_headers()
+    session = get_session()
+    total_rows = 0
     updated = 0
     skipped = 0
     errors = 0
 
-    for i, row in enumerate(rows):
-        progress = 10 + int((i / len(rows)) * 85)
+    # Validate and map rows as they are read, so only real updates go to the workers.
+    # Only the last rating per ticket matters, so each ticket is PATCHed once.
+    work = {}
+    try:
+        with open(csv_file, 'r', encoding='utf-8-sig', newline='') as f:
+            reader = csv.reader(f)
+            header = next(reader, [])
+            ticket_idx = header.index('Ticket#')
+            rating_idx = header.index('Rating')
+
+            for row in reader:
+                if not row:
+                    continue  # blank line
+                total_rows += 1
+
+                # Parse the ticket ID, including float-formatted ones like "497225.0"
+                try:
+                    ticket_num = int(float(row[ticket_idx]))
+                except (IndexError, ValueError, OverflowError):
+                    ticket_num = 0
 
-        ticket_id = str(row.get('Ticket#', '')).strip()
-        if '.' in ticket_id:
-            ticket_id = ticket_id.split('.')[0]
+                if ticket_num <= 0:
+                    skipped += 1
+                    continue
 
-        if not ticket_id or not ticket_id.isdigit():
-            skipped += 1
-            continue
+                ticket_id = str(ticket_num)
 
-        rating = str(row.get('Rating', '')).strip().upper()
-        if rating not in RATING_MAP:
-            skipped += 1
-            continue
+                rating = row[rating_idx].strip().upper() if rating_idx < len(row) else ''
+                if rating not in RATING_MAP:
+                    skipped += 1
+                    continue
 
-        rating_value = RATING_MAP[rating]
+                if ticket_id in work:
+                    skipped += 1
 
+                work[ticket_id] = RATING_MAP[rating]
+    except Exception as e:
+        send_status(session_id, f"Error reading CSV: {e}", 100, "error")
+        return {"success": False, "error": str(e)}
+
+    send_status(session_id, f"Loaded {total_rows} rows from CSV, {len(work)} tickets to update", 10)
+
+    def update_one(ticket_id, rating_value):
+        """Update one ticket's rating. Returns (outcome, message, status_type)."""
         if dry_run:
-            send_status(session_id, f"[DRY RUN] Ticket {ticket_id}: Would set rating to {rating_value}", progress)
-            updated += 1
-        else:
-            url = tickets_url(ticket_id)
-            payload = [{
-                "op": "replace",
-                "path": "customFields",
-                "value": [{
-                    "id": 18,
-                    "caption": "Latest Crewhu Rating",
-                    "type": "Text",
-                    "entryMethod": "EntryField",
-                    "numberOfDecimals": 0,
-                    "value": rating_value
-                }]
-            }]
+            return "updated", f"[DRY RUN] Ticket {ticket_id}: Would set rating to {rating_value}", "info"
 
-            try:
-                response = requests.patch(url, headers=headers, json=payload)
-                if response.status_code == 200:
-                    send_status(session_id, f"Ticket {ticket_id}: Updated rating to {rating_value}", progress)
-                    updated += 1
-                else:
-                    send_status(session_id, f"Ticket {ticket_id}: Error {response.status_code}", progress, "warning")
-                    errors += 1
-            except Exception as e:
-                send_status(session_id, f"Ticket {ticket_id}: Network error", progress, "error")
+        url = tickets_url(ticket_id)
+
+        try:
+            response = session.patch(url, data=patch_bodies[rating_value])
+            if response.status_code == 200:
+                return "updated", f"Ticket {ticket_id}: Updated rating to {rating_value}", "info"
+            return "errors", f"Ticket {ticket_id}: Error {response.status_code}", "warning"
+        except Exception as e:
+            return "errors", f"Ticket {ticket_id}: Network error", "error"
+
+    # Tickets are independent, so update several at a time
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        futures = [executor.submit(update_one, ticket_id, rating_value) for ticket_id, rating_value in work.items()]
+
+        for i, future in enumerate(as_completed(futures)):
+            progress = 10 + int((i / len(work)) * 85)
+            outcome, message, status_type = future.result()
+
+            if outcome == "updated":
+                updated += 1
+            else:
                 errors += 1
 
+            if message:
+                send_status(session_id, message, progress, status_type, throttle=True)
+
     send_status(session_id, f"Ratings update complete! Updated: {updated}, Skipped: {skipped}, Errors: {errors}", 100, "success")
 
     return {
         "success": True,
-        "total_rows": len(rows),
+        "total_rows": total_rows,
         "updated": updated,
         "skipped": skipped,
         "errors": errors,
@@ -254,8 +366,10 @@ def run_post_ratings(csv_file, session_id, dry_run=True):
 
 def run_post_notes(json_file, session_id, dry_run=True):
     """Run the POST_Notes_Internal logic with status updates."""
-    import requests
-    from connectwise_api import validate_credentials, get_headers, ticket_notes_url
+    from connectwise_api import (
+        MAX_WORKERS, validate_credentials, get_session, ticket_notes_url,
+        is_automated_note
+    )
 
     send_status(session_id, "Starting notes posting...", 0)
 
@@ -265,70 +379,80 @@ def run_post_notes(json_file, session_id, dry_run=True):
         return {"success": False, "error": f"Missing credentials: {', '.join(missing)}"}
 
     try:
-        with open(json_file, 'r', encoding='utf-8') as f:
-            parsed_data = json.load(f)
+        parsed_data = load_json(json_file)
     except Exception as e:
         send_status(session_id, f"Error reading JSON: {e}", 100, "error")
         return {"success": False, "error": str(e)}
 
     send_status(session_id, f"Loaded {len(parsed_data)} survey entries", 10)
 
-    headers = get_headers()
+    session = get_session()
+    date_created = datetime.now(timezone.utc).isoformat()
     posted = 0
     errors = 0
 
-    for i, entry in enumerate(parsed_data):
-        progress = 10 + int((i / len(parsed_data)) * 85)
-
+    def post_one(entry):
+        """Replace one ticket's automation note. Returns (outcome, message, status_type)."""
         ticket_id = entry.get("ticket_number")
         summary = entry.get("summary", "").strip()
         feedback = entry.get("customer_feedback", "No feedback provided.").strip()
 
         if not ticket_id:
-            continue
+            return "skipped", None, None
 
         final_note_text = f"{summary}\n\nCustomer feedback:\n{feedback}"
 
         if dry_run:
-            send_status(session_id, f"[DRY RUN] Ticket {ticket_id}: Would post internal note", progress)
-            posted += 1
-        else:
-            # Delete old automated notes first
-            try:
-                notes_url = ticket_notes_url(ticket_id)
-                resp = requests.get(notes_url, headers=headers)
-                if resp.status_code == 200:
-                    for note in resp.json():
-                        text = (note.get("text") or "")
-                        if "just gave a" in text and "Customer feedback:" in text:
-                            del_url = ticket_notes_url(ticket_id, note.get("id"))
-                            requests.delete(del_url, headers=headers)
-            except:
-                pass
-
-            # Post new note
-            payload = {
-                "text": final_note_text,
-                "detailDescriptionFlag": False,
-                "internalAnalysisFlag": True,
-                "resolutionFlag": False,
-                "createdBy": "Crewhu API",
-                "dateCreated": datetime.now(timezone.utc).isoformat()
-            }
+            return "posted", f"[DRY RUN] Ticket {ticket_id}: Would post internal note", "info"
+
+        # Delete old automated notes first
+        try:
+            notes_url = ticket_notes_url(ticket_id)
+            resp = session.get(notes_url)
+            if resp.status_code == 200:
+                for note in resp.json():
+                    text = (note.get("text") or "")
+                    if is_automated_note(text):
+                        del_url = ticket_notes_url(ticket_id, note.get("id"))
+                        session.delete(del_url)
+        except:
+            pass
+
+        # Post new note
+        payload = {
+            "text": final_note_text,
+            "detailDescriptionFlag": False,
+            "internalAnalysisFlag": True,
+            "resolutionFlag": False,
+            "createdBy": "Crewhu API",
+            "dateCreated": date_created
+        }
 
-            try:
-                url = ticket_notes_url(ticket_id)
-                response = requests.post(url, headers=headers, json=payload)
-                if response.status_code == 201:
-                    send_status(session_id, f"Ticket {ticket_id}: Posted internal note", progress)
-                    posted += 1
-                else:
-                    send_status(session_id, f"Ticket {ticket_id}: Error {response.status_code}", progress, "warning")
-                    errors += 1
-            except Exception as e:
-                send_status(session_id, f"Ticket {ticket_id}: Network error", progress, "error")
+        try:
+            url = ticket_notes_url(ticket_id)
+            response = session.post(url, json=payload)
+            if response.status_code == 201:
+                return "posted", f"Ticket {ticket_id}: Posted internal note", "info"
+            return "errors", f"Ticket {ticket_id}: Error {response.status_code}", "warning"
+        except Exception as e:
+            return "errors", f"Ticket {ticket_id}: Network error", "error"
+
+    # Tickets are independent, so process several at a time
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        futures = [executor.submit(post_one, entry) for entry in parsed_data]
+
+        for i, future in enumerate(as_completed(futures)):
+            progress = 10 + int((i / len(parsed_data)) * 85)
+            outcome, message, status_type = future.result()
+
+            if outcome == "posted":
+                posted += 1
+            elif outcome == "errors":
                 errors += 1
 
+            if message:
+                send_status(session_id, message, progress, status_type, throttle=True)
+
     send_status(session_id, f"Notes posting complete! Posted: {posted}, Errors: {errors}", 100, "success")
 
     return {
@@ -340,6 +464,33 @@ def run_post_notes(json_file, session_id, dry_run=True):
     }
 
 
+def submit_job(session_id, task):
+    """
+    Run task() on the job pool and send its result as the "done" message.
+    An unexpected exception is logged and reported as a failed "done", so
+    the page never waits on a job that died.
+    """
+    # Create the queue now so messages sent before the stream connects are kept
+    q = get_status_queue(session_id)
+
+    def run_task():
+        try:
+            result = task()
+        except Exception as e:
+            app.logger.exception("Job for session %s failed", session_id)
+            send_status(session_id, f"Unexpected error: {e}", 100, "error")
+            result = {"success": False, "error": str(e)}
+        send_status(session_id, json.dumps(result), 100, "done")
+
+        # A stream closing removes the queue; if none ever connects, give it
+        # a grace period to pick up the result and then drop the queue
+        timer = threading.Timer(STATUS_QUEUE_GRACE, drop_unread_queue, (session_id, q))
+        timer.daemon = True
+        timer.start()
+
+    job_executor.submit(run_task)
+
+
 # ==========================================
 # ROUTES
 # ==========================================
@@ -364,16 +515,19 @@ def check_status():
 def stream(session_id):
     """SSE endpoint for status updates."""
     def generate():
-        q = get_status_queue(session_id)
-        while True:
-            try:
-                status = q.get(timeout=30)
-                if status.get("type") == "done":
-                    yield f"data: {json.dumps(status)}\n\n"
-                    break
-                yield f"data: {json.dumps(status)}\n\n"
-            except queue.Empty:
-                yield f"data: {json.dumps({'type': 'keepalive'})}\n\n"
+        q = open_stream(session_id)
+        try:
+            while True:
+                try:
+                    status = q.get(timeout=30)
+                    yield b"data: " + dumps(status) + b"\n\n"
+                    if status.get("type") == "done":
+                        break
+                except queue.Empty:
+                    yield _KEEPALIVE
+        finally:
+            # Runs on completion and when the client disconnects
+            cleanup_queue(session_id, q)
 
     return Response(generate(), mimetype='text/event-stream')
 
@@ -413,12 +567,7 @@ def parse_emails():
     input_path = app.config['UPLOAD_FOLDER'] / input_file
     output_path = app.config['UPLOAD_FOLDER'] / 'crewhu_surveys_clean.json'
 
-    def run_task():
-        result = run_reformat_json(input_path, output_path, session_id, dry_run)
-        send_status(session_id, json.dumps(result), 100, "done")
-
-    thread = threading.Thread(target=run_task)
-    thread.start()
+    submit_job(session_id, lambda: run_reformat_json(input_path, output_path, session_id, dry_run))
 
     return jsonify({"status": "started", "session_id": session_id})
 
@@ -436,12 +585,7 @@ def post_ratings():
 
     csv_path = app.config['UPLOAD_FOLDER'] / csv_file
 
-    def run_task():
-        result = run_post_ratings(csv_path, session_id, dry_run)
-        send_status(session_id, json.dumps(result), 100, "done")
-
-    thread = threading.Thread(target=run_task)
-    thread.start()
+    submit_job(session_id, lambda: run_post_ratings(csv_path, session_id, dry_run))
 
     return jsonify({"status": "started", "session_id": session_id})
 
@@ -456,12 +600,7 @@ def post_notes():
 
     json_path = app.config['UPLOAD_FOLDER'] / json_file
 
-    def run_task():
-        result = run_post_notes(json_path, session_id, dry_run)
-        send_status(session_id, json.dumps(result), 100, "done")
-
-    thread = threading.Thread(target=run_task)
-    thread.start()
+    submit_job(session_id, lambda: run_post_notes(json_path, session_id, dry_run))
 
     return jsonify({"status": "started", "session_id": session_id})
 
@@ -469,14 +608,17 @@ def post_notes():
 @app.route('/api/files')
 def list_files():
     """List uploaded files."""
-    files = []
-    for f in app.config['UPLOAD_FOLDER'].iterdir():
-        if f.is_file():
-            files.append({
-                "name": f.name,
-                "size": f.stat().st_size,
-                "modified": datetime.fromtimestamp(f.stat().st_mtime).isoformat()
-            })
+    # DirEntry caches the stat result, so each file costs one stat call
+    with os.scandir(app.config['UPLOAD_FOLDER']) as entries:
+        files = []
+        for entry in entries:
+            if entry.is_file():
+                st = entry.stat()
+                files.append({
+                    "name": entry.name,
+                    "size": st.st_size,
+                    "modified": datetime.fromtimestamp(st.st_mtime).isoformat()
+                })
     return jsonify(files)
 
 
@@ -7,7 +7,12 @@ interacting with the ConnectWise Manage API.
 
 import os
 import base64
+import re
 import sys
+import types
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -21,6 +26,9 @@ PRIVATE_KEY = os.environ.get("CW_PRIVATE_KEY")
 CLIENT_ID = os.environ.get("CW_CLIENT_ID")
 API_BASE = os.environ.get("CW_API_BASE", "https://na.myconnectwise.net/v4_6_release/apis/3.0")
 
+# Maximum number of tickets processed in parallel (ConnectWise's concurrent request limit)
+MAX_WORKERS = int(os.environ.get("CW_MAX_WORKERS", 20))
+
 
 # ==========================================
 # CREDENTIAL VALIDATION
@@ -60,19 +68,72 @@ def require_credentials():
 # ==========================================
 # AUTHENTICATION
 # ==========================================
+# The credentials are fixed for the life of the process, so the auth header
+# and the full header set are built once at import time
+_AUTH_HEADER = "Basic " + base64.b64encode(
+    f"{COMPANY_ID}+{PUBLIC_KEY}:{PRIVATE_KEY}".encode()
+).decode()
+
+_HEADERS = types.MappingProxyType({
+    "Authorization": _AUTH_HEADER,
+    "clientId": CLIENT_ID,
+    "Accept": "application/json",
+    "Content-Type": "application/json",
+    "Connection": "keep-alive"
+})
+
+
 def get_headers():
     """
-    Build and return the authentication headers for ConnectWise API calls.
+    Return the authentication headers for ConnectWise API calls
+    (a read-only mapping shared by all callers).
     """
-    auth_string = f"{COMPANY_ID}+{PUBLIC_KEY}:{PRIVATE_KEY}"
-    auth_base64 = base64.b64encode(auth_string.encode()).decode()
-
-    return {
-        "Authorization": f"Basic {auth_base64}",
-        "clientId": CLIENT_ID,
-        "Accept": "application/json",
-        "Content-Type": "application/json"
-    }
+    return _HEADERS
+
+
+# ==========================================
+# HTTP SESSION
+# ==========================================
+_session = None
+
+
+def get_session():
+    """
+    Return a shared requests.Session for ConnectWise API calls.
+
+    The session keeps connections alive between calls (no new TLS handshake
+    per request), retries on rate limiting / transient server errors, and
+    already carries the authentication headers.
+    """
+    global _session
+
+    if _session is None:
+        # PATCH is retried too (rating/link updates set a value, so repeating
+        # one is harmless); POST is left out so a retry can never post a
+        # duplicate note
+        retries = Retry(
+            total=3,
+            backoff_factor=0.3,
+            status_forcelist=[429, 500, 502, 503, 504],
+            allowed_methods=frozenset(["HEAD", "GET", "PUT", "PATCH", "DELETE", "OPTIONS", "TRACE"]),
+            # Once retries run out, return the last response so callers'
+            # status-code handling still sees the 429/5xx
+            raise_on_status=False
+        )
+        # One keep-alive connection per worker thread, so parallel requests
+        # never have to open (and then discard) extra connections
+        adapter = HTTPAdapter(
+            pool_connections=MAX_WORKERS,
+            pool_maxsize=MAX_WORKERS,
+            max_retries=retries
+        )
+
+        session = requests.Session()
+        session.mount("https://", adapter)
+        session.headers.update(get_headers())
+        _session = session
+
+    return _session
 
 
 # ==========================================
@@ -91,3 +152,15 @@ def ticket_notes_url(ticket_id, note_id=None):
     if note_id:
         return f"{base}/{note_id}"
     return base
+
+
+# ==========================================
+# AUTOMATION NOTES
+# ==========================================
+# Notes posted by these scripts read "... just gave a ... \n\nCustomer feedback:\n..."
+AUTO_NOTE_PATTERN = re.compile(r"just gave a.*Customer feedback:", re.DOTALL)
+
+
+def is_automated_note(text):
+    """Return True if a note's text matches the format posted by these scripts."""
+    return AUTO_NOTE_PATTERN.search(text) is not None
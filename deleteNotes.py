@@ -5,15 +5,17 @@ This script removes notes that were previously created by the
 POST_Notes_Internal.py script. Useful for cleanup or re-running.
 """
 
-import json
-import requests
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 from connectwise_api import (
+    MAX_WORKERS,
     require_credentials,
-    get_headers,
+    get_session,
+    is_automated_note,
     ticket_notes_url
 )
+from json_utils import load_json
 
 # ==========================================
 # CONFIGURATION
@@ -26,53 +28,60 @@ INPUT_FILE = Path("crewhu_surveys_clean.json")
 # ==========================================
 # DELETE LOGIC
 # ==========================================
-def process_ticket_deletion(ticket_id, headers):
-    """Find and delete automated Crewhu notes from a ticket."""
+def find_automated_notes(ticket_id, session):
+    """Return the IDs of automated Crewhu notes on a ticket."""
     notes_url = ticket_notes_url(ticket_id)
 
     try:
         # Get all notes for the ticket
-        response = requests.get(notes_url, headers=headers)
+        response = session.get(notes_url)
 
         if response.status_code == 404:
             print(f"[{ticket_id}] Ticket not found.")
-            return 0
+            return []
         elif response.status_code != 200:
             print(f"[{ticket_id}] Error fetching notes: {response.status_code}")
-            return 0
+            return []
 
-        notes = response.json()
-        notes_deleted = 0
+        note_ids = []
 
         # Loop through notes to find matches
-        for note in notes:
-            note_id = note.get('id')
-            text = note.get('text', '')
+        for note in response.json():
+            text = note.get('text') or ''
 
             # Only delete if it matches the specific format generated by our scripts
-            if "just gave a" in text and "Customer feedback:" in text:
+            if is_automated_note(text):
+                note_ids.append(note.get('id'))
 
                 if DRY_RUN:
-                    print(f"[{ticket_id}] (DRY RUN) Would delete Note ID {note_id}:")
+                    print(f"[{ticket_id}] (DRY RUN) Would delete Note ID {note.get('id')}:")
                     print(f"    Content: {text[:50]}...")
-                else:
-                    del_url = ticket_notes_url(ticket_id, note_id)
-                    del_resp = requests.delete(del_url, headers=headers)
 
-                    if del_resp.status_code in [200, 204]:
-                        print(f"[{ticket_id}] Deleted Note ID {note_id}")
-                        notes_deleted += 1
-                    else:
-                        print(f"[{ticket_id}] Failed to delete Note {note_id}: {del_resp.status_code}")
-
-        if notes_deleted == 0 and not DRY_RUN:
+        if not note_ids and not DRY_RUN:
             print(f"[{ticket_id}] No matching Crewhu notes found.")
 
-        return notes_deleted
+        return note_ids
 
     except Exception as e:
         print(f"[{ticket_id}] Connection error: {e}")
-        return 0
+        return []
+
+
+def delete_note(ticket_id, note_id, session):
+    """Delete a single note. Returns True on success."""
+    try:
+        del_resp = session.delete(ticket_notes_url(ticket_id, note_id))
+
+        if del_resp.status_code in [200, 204]:
+            print(f"[{ticket_id}] Deleted Note ID {note_id}")
+            return True
+
+        print(f"[{ticket_id}] Failed to delete Note {note_id}: {del_resp.status_code}")
+        return False
+
+    except Exception as e:
+        print(f"[{ticket_id}] Connection error deleting Note {note_id}: {e}")
+        return False
 
 
 # ==========================================
@@ -87,23 +96,34 @@ def main():
         print("Make sure the JSON file is in the same folder.")
         return
 
-    headers = get_headers()
+    session = get_session()
 
-    with open(INPUT_FILE, 'r', encoding='utf-8') as f:
-        data = json.load(f)
+    data = load_json(INPUT_FILE)
 
     print(f"Starting cleanup for {len(data)} tickets")
 
     if DRY_RUN:
         print("!!! DRY RUN MODE - No data will be deleted !!!\n")
 
+    ticket_ids = [entry.get('ticket_number') for entry in data if entry.get('ticket_number')]
+
     total_deleted = 0
 
-    for entry in data:
-        ticket_id = entry.get('ticket_number')
-        if ticket_id:
-            deleted = process_ticket_deletion(ticket_id, headers)
-            total_deleted += deleted
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        # Pass 1: fetch notes for all tickets concurrently
+        found = executor.map(lambda ticket_id: find_automated_notes(ticket_id, session), ticket_ids)
+        to_delete = [
+            (ticket_id, note_id)
+            for ticket_id, note_ids in zip(ticket_ids, found)
+            for note_id in note_ids
+        ]
+
+        # Pass 2: notes are independent, so delete them all concurrently
+        # instead of one after another within each ticket
+        if not DRY_RUN:
+            total_deleted = sum(
+                executor.map(lambda pair: delete_note(pair[0], pair[1], session), to_delete)
+            )
 
     # Summary
     print("\n" + "=" * 40)
@@ -159,7 +159,7 @@ Write-Host "Using folder: $($Folder.Name)"
 
 # Get and sort items
 $Items = $Folder.Items
-$Items.Sort("ReceivedTime", $false)  # Newest first
+$Items.Sort("ReceivedTime", $false)  # Oldest first (not descending)
 
 $Output = @()
 $ProcessedCount = 0
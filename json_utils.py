@@ -0,0 +1,113 @@
+"""
+Shared JSON helpers for Crewhu integration scripts.
+
+Uses orjson for decoding/encoding and ijson for streaming when they are
+installed, and falls back to the standard library json module otherwise.
+"""
+
+import codecs
+import json
+import mmap
+import os
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+# Raised for malformed input by whichever backend is in use
+# (json, orjson and UnicodeDecodeError are all ValueErrors)
+DECODE_ERRORS = (ValueError,) if ijson is None else (ValueError, ijson.JSONError)
+
+
+class InvalidJSONError(ValueError):
+    """Raised by iter_json_items when the input itself is not valid JSON."""
+
+
+# ==========================================
+# DECODING
+# ==========================================
+def loads(data):
+    """Decode JSON from bytes, ignoring a leading UTF-8 BOM."""
+    if data.startswith(codecs.BOM_UTF8):
+        data = data[len(codecs.BOM_UTF8):]
+
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def load_json(path):
+    """
+    Read and decode a JSON file.
+    With orjson the file is memory-mapped and parsed in place, so large
+    exports are not first copied into a bytes object.
+    """
+    with open(path, "rb") as f:
+        # mmap cannot map an empty file
+        if orjson is None or os.fstat(f.fileno()).st_size == 0:
+            return loads(f.read())
+
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            start = len(codecs.BOM_UTF8) if mm[:len(codecs.BOM_UTF8)] == codecs.BOM_UTF8 else 0
+            with memoryview(mm)[start:] as view:
+                return orjson.loads(view)
+
+
+# ==========================================
+# STREAMING
+# ==========================================
+def iter_json_items(f):
+    """
+    Yield the items of a top-level JSON array one at a time.
+    `f` must be a file opened in binary mode. With ijson installed the
+    array is stream-parsed, so only one item is held in memory at a time;
+    otherwise items are released as they are consumed.
+    """
+    # Skip a leading UTF-8 BOM (PowerShell exports include one)
+    if f.read(len(codecs.BOM_UTF8)) != codecs.BOM_UTF8:
+        f.seek(0)
+
+    # Decoding errors are re-raised as InvalidJSONError, so callers can tell
+    # bad input apart from ValueErrors raised while processing the items
+    if ijson is not None:
+        try:
+            yield from ijson.items(f, "item")
+        except DECODE_ERRORS as e:
+            raise InvalidJSONError(str(e)) from e
+    else:
+        try:
+            items = loads(f.read())
+        except DECODE_ERRORS as e:
+            raise InvalidJSONError(str(e)) from e
+
+        # Without ijson the whole array is decoded up front; hand items out
+        # by popping them so each one can be freed once the caller is done
+        items.reverse()
+        while items:
+            yield items.pop()
+
+
+# ==========================================
+# ENCODING
+# ==========================================
+def dumps(data):
+    """Encode data as compact JSON bytes."""
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, separators=(",", ":")).encode("utf-8")
+
+
+def dump_json(data, path):
+    """Write data to a JSON file, indented for readability."""
+    if orjson is not None:
+        with open(path, "wb") as f:
+            f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2))
+    else:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
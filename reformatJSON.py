@@ -5,9 +5,21 @@ Reads raw email JSON exported from Outlook and extracts structured
 survey information (ticket number, rating, feedback) into a clean format.
 """
 
-import json
-import re
+import hashlib
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from operator import itemgetter
 from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from json_utils import InvalidJSONError, dump_json, iter_json_items
+
+try:
+    import re2 as re_engine  # google-re2: linear-time matching, no backtracking
+except ImportError:
+    import re as re_engine
 
 # ---------------------------------------------------------
 # Configuration
@@ -16,93 +28,128 @@ DRY_RUN = False  # Set to True to preview output without writing file
 
 INPUT_FILE = Path("crewhu_notifications_NEW.json")
 OUTPUT_FILE = Path("crewhu_surveys_clean.json")
+HASH_FILE = OUTPUT_FILE.with_suffix(".hash")  # Fingerprint of the input behind OUTPUT_FILE
+
+PARSE_WORKERS = os.cpu_count() or 1  # Processes used to parse emails
+BATCH_SIZE = 256  # Emails sent to a worker process at a time
 
 
 # ---------------------------------------------------------
 # Regex Patterns
 # ---------------------------------------------------------
+# Flags are inline so the patterns compile the same under re2 and re.
+# The sentence patterns are searched against the whole body; "[^\n]" keeps a
+# match on one line, and (?m) makes ^ and $ match at each line start/end.
+# The customer field is unbounded, so a match can always start at the
+# beginning of its line; anchoring at ^ therefore finds the same sentences
+# while trying one start position per line instead of one per character,
+# which keeps a long body full of "from"/"gave a" words from blowing up
+# backtracking. The other fields have generous bounds for the same reason.
+# Both sentence formats are matched by one alternation; group names are
+# suffixed _r/_w per branch and the suffix is dropped after matching.
+# Patterns are bytes: each body is encoded to UTF-8 once and only the
+# captured groups are decoded.
+
 # Pattern for "Review" style emails
 # "Name from Company gave a Rating rating to Employee for Categories on ticket# ID (Desc)."
-REGEX_REVIEW = re.compile(
-    r"(?P<customer>.*?) from (?P<company>.*?) gave a (?P<rating>.*?) rating to (?P<employee>.*?) for (?P<categories>.*?) on ticket# (?P<ticket_id>\d+)\s*\((?P<ticket_desc>.*?)\)",
-    re.IGNORECASE
+REVIEW_PATTERN = (
+    rb"(?P<customer_r>[^\n]*?) from (?P<company_r>[^\n]{1,300}?) gave a (?P<rating_r>[^\n]{1,100}?) rating to (?P<employee_r>[^\n]{1,200}?) for (?P<categories_r>[^\n]*?) on ticket# (?P<ticket_id_r>\d+)\s*\((?P<ticket_desc_r>[^)\n]*)\)"
 )
 
 # Pattern for "Woohoo" style emails
 # "Name from Company gave a Rating Rating for Categories on ticket# ID (Desc) to your colleague Employee."
-REGEX_WOOHOO = re.compile(
-    r"(?P<customer>.*?) from (?P<company>.*?) gave a (?P<rating>.*?) Rating for (?P<categories>.*?) on ticket# (?P<ticket_id>\d+)\s*\((?P<ticket_desc>.*?)\) to your colleague (?P<employee>.+?)\.?$",
-    re.IGNORECASE
+WOOHOO_PATTERN = (
+    rb"(?P<customer_w>[^\n]*?) from (?P<company_w>[^\n]{1,300}?) gave a (?P<rating_w>[^\n]{1,100}?) Rating for (?P<categories_w>[^\n]*?) on ticket# (?P<ticket_id_w>\d+)\s*\((?P<ticket_desc_w>[^\n]*?)\) to your colleague (?P<employee_w>[^\n]{1,200}?)\.?$"
 )
 
+REGEX_COMBINED = re_engine.compile(rb"(?im)^(?:" + REVIEW_PATTERN + rb"|" + WOOHOO_PATTERN + rb")")
+
 # Pattern for Feedback
-REGEX_FEEDBACK = re.compile(
-    r"Customer feedback:\s*(?:\"(?P<quote>.*?)\"|(?P<none>No feedback provided))",
-    re.IGNORECASE | re.DOTALL
+# The quote is a run of non-quote characters, which may span lines, so no
+# DOTALL and no lazy matching is needed
+REGEX_FEEDBACK = re_engine.compile(
+    rb"(?i)Customer feedback:\s*(?:\"(?P<quote>[^\"]*)\"|(?P<none>No feedback provided))"
 )
 
+# Bound search methods, looked up once instead of per email
+_combined_search = REGEX_COMBINED.search
+_feedback_search = REGEX_FEEDBACK.search
+
 
 # ---------------------------------------------------------
 # Parsing Logic
 # ---------------------------------------------------------
-def extract_survey_from_email(email):
-    """Extract survey data from a single email. Returns dict or None."""
+def email_text(email: Dict[str, Any]) -> Tuple[str, str]:
+    """Return an email's (subject, body)."""
     # Support both raw email format (Subject/FullBody) and processed format (summary/full_clean_body)
-    subject = email.get('Subject', '') or email.get('summary', '')
-    full_body = email.get('FullBody', '') or email.get('full_clean_body', '')
+    # Raw exports always carry Subject/FullBody, so index them directly
+    try:
+        subject: str = email['Subject'] or email.get('summary') or ''
+    except KeyError:
+        subject = email.get('summary') or ''
+    try:
+        full_body: str = email['FullBody'] or email.get('full_clean_body') or ''
+    except KeyError:
+        full_body = email.get('full_clean_body') or ''
+    return subject, full_body
 
-    # Skip if it's not a rating email (check both subject and body since format varies)
-    if 'rating' not in subject.lower() and 'gave a' not in full_body.lower():
-        return None
 
-    match_data = None
+def is_survey_candidate(subject: str, full_body: str) -> bool:
+    """Cheap substring checks that rule out emails which cannot hold a survey."""
+    # Every survey sentence contains "ticket#" (matched case-insensitively,
+    # like the regex); skip other notifications before any regex work
+    body_lower = full_body.lower()
+    if 'ticket#' not in body_lower:
+        return False
 
-    # Split by lines to find the specific sentence and avoid "EXTERNAL EMAIL" headers
-    cleaned_lines = [line.strip() for line in full_body.splitlines() if line.strip()]
+    # Skip if it's not a rating email (check both subject and body since format varies)
+    return 'rating' in subject.lower() or 'gave a' in body_lower
 
-    for line in cleaned_lines:
-        # Try matching the "Review" format line
-        m1 = REGEX_REVIEW.search(line)
-        if m1:
-            match_data = m1.groupdict()
-            break
 
-        # Try matching the "Woohoo" format line
-        m2 = REGEX_WOOHOO.search(line)
-        if m2:
-            match_data = m2.groupdict()
-            break
+def parse_survey(full_body: str) -> Optional[Dict[str, Any]]:
+    """Extract survey data from an email body. Returns dict or None."""
+    # Outlook bodies often contain non-breaking spaces, which \s only
+    # matches in str patterns
+    body: bytes = full_body.replace('\xa0', ' ').encode('utf-8')
 
-    if not match_data:
+    # One scan of the whole body; the patterns cannot span lines, so header
+    # lines such as "EXTERNAL EMAIL" are never part of a match
+    m = _combined_search(body)
+    if not m:
         return None
 
+    # Keep only the groups of the branch that matched, without the suffix,
+    # decoded and stripped in the same pass
+    match_data: Dict[str, str] = {
+        k[:-2]: v.decode('utf-8', errors='replace').strip() for k, v in m.groupdict().items() if v is not None
+    }
+
     # Extract Ticket ID
     ticket_id_str = match_data['ticket_id']
-    ticket_id_int = int(ticket_id_str)
+    ticket_id_int: int = int(ticket_id_str)
 
     # Cleanup Extracted Data
-    customer = match_data['customer'].strip()
-    company = match_data['company'].strip()
-    rating = match_data['rating'].strip()
-    employee = match_data['employee'].strip().rstrip('.')
-    categories = match_data['categories'].strip()
-    ticket_desc = match_data['ticket_desc'].strip()
-
-    # Extract Feedback from the full body block
-    feedback_text = "No feedback provided."
-    fb_match = REGEX_FEEDBACK.search(full_body)
-    if fb_match:
-        if fb_match.group('quote'):
-            feedback_text = fb_match.group('quote').strip()
-        elif fb_match.group('none'):
-            feedback_text = "No feedback provided."
+    customer = match_data['customer']
+    company = match_data['company']
+    rating = match_data['rating']
+    employee = match_data['employee'].rstrip('.')
+    categories = match_data['categories']
+    ticket_desc = match_data['ticket_desc']
 
     # Construct the summary sentence
-    summary_sentence = (
+    summary_sentence: str = (
         f"{customer} from {company} just gave a {rating} rating to {employee} "
         f"for {categories} on ticket# {ticket_id_str} ({ticket_desc})."
     )
 
+    # Extract Feedback from the full body block
+    feedback_text: str = "No feedback provided."
+    fb_match = _feedback_search(body)
+    if fb_match:
+        quote = fb_match.group('quote')
+        if quote:
+            feedback_text = quote.decode('utf-8', errors='replace').strip()
+
     return {
         "ticket_number": ticket_id_int,
         "summary": summary_sentence,
@@ -110,6 +157,55 @@ def extract_survey_from_email(email):
     }
 
 
+def extract_survey_from_email(email: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Extract survey data from a single email. Returns dict or None."""
+    subject, full_body = email_text(email)
+    if not is_survey_candidate(subject, full_body):
+        return None
+    return parse_survey(full_body)
+
+
+def parse_batch(bodies: List[str]) -> List[Optional[Dict[str, Any]]]:
+    """Parse a batch of email bodies in a worker process."""
+    return [parse_survey(body) for body in bodies]
+
+
+def iter_parsed(bodies: Iterable[str]) -> Iterator[Optional[Dict[str, Any]]]:
+    """
+    Yield parse_survey results in input order, parsing batches of bodies
+    across worker processes. At most two batches per worker are in flight,
+    so the export is still streamed rather than loaded whole.
+    """
+    pending = deque()
+    bodies = iter(bodies)
+    batches = iter(lambda: list(islice(bodies, BATCH_SIZE)), [])
+
+    with ProcessPoolExecutor(max_workers=PARSE_WORKERS) as executor:
+        for batch in batches:
+            pending.append(executor.submit(parse_batch, batch))
+            if len(pending) >= PARSE_WORKERS * 2:
+                yield from pending.popleft().result()
+
+        while pending:
+            yield from pending.popleft().result()
+
+
+# ---------------------------------------------------------
+# Output Cache
+# ---------------------------------------------------------
+def input_fingerprint(path):
+    """
+    Hash the input file together with this script, so that edits to the
+    parser also invalidate a previously written output.
+    """
+    h = hashlib.blake2b(digest_size=16)
+    for source in (Path(__file__), path):
+        with open(source, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                h.update(chunk)
+    return h.hexdigest()
+
+
 # ---------------------------------------------------------
 # Main
 # ---------------------------------------------------------
@@ -119,32 +215,53 @@ def main():
         print(f"ERROR: Could not find {INPUT_FILE}")
         return
 
-    # Load emails
-    try:
-        with open(INPUT_FILE, 'r', encoding='utf-8-sig') as f:
-            emails = json.load(f)
-    except json.JSONDecodeError:
-        print(f"ERROR: Invalid JSON format in {INPUT_FILE}")
-        return
+    # Skip the whole run when the output was already built from this input
+    fingerprint = None
+    if not DRY_RUN:
+        fingerprint = input_fingerprint(INPUT_FILE)
+        if OUTPUT_FILE.exists() and HASH_FILE.exists() and HASH_FILE.read_text() == fingerprint:
+            print(f"{INPUT_FILE} is unchanged since {OUTPUT_FILE} was written - nothing to do.")
+            return
 
-    print(f"Scanning {len(emails)} emails...")
+    print(f"Scanning emails in {INPUT_FILE}...")
 
     if DRY_RUN:
         print("!!! DRY RUN MODE - Output file will not be written !!!\n")
 
     # Process emails and deduplicate by ticket ID
     surveys = {}
-    skipped = 0
+    total_scanned = 0
+    extracted = 0
+
+    def candidate_bodies(emails):
+        # The cheap substring checks run here, so only bodies that may hold a
+        # survey are copied to the worker processes
+        nonlocal total_scanned
+        for email in emails:
+            total_scanned += 1
+            subject, full_body = email_text(email)
+            if is_survey_candidate(subject, full_body):
+                yield full_body
+
+    # Emails are stream-parsed rather than loading the whole export, and
+    # parsed in batches on all cores
+    try:
+        with open(INPUT_FILE, 'rb') as f:
+            for result in iter_parsed(candidate_bodies(iter_json_items(f))):
+                if not result:
+                    continue
+                extracted += 1
+
+                # Exports are oldest first, so the last survey per ticket is the newest
+                surveys[result['ticket_number']] = result
+    except InvalidJSONError:
+        print(f"ERROR: Invalid JSON format in {INPUT_FILE}")
+        return
 
-    for email in emails:
-        result = extract_survey_from_email(email)
-        if result:
-            surveys[result['ticket_number']] = result
-        else:
-            skipped += 1
+    skipped = total_scanned - extracted
 
     # Sort by ticket number
-    sorted_data = sorted(surveys.values(), key=lambda x: x['ticket_number'])
+    sorted_data = sorted(surveys.values(), key=itemgetter('ticket_number'))
 
     # Preview or save
     if DRY_RUN:
@@ -159,8 +276,8 @@ def main():
             print(f"... and {len(sorted_data) - 5} more surveys")
     else:
         try:
-            with open(OUTPUT_FILE, 'w', encoding='utf-8') as f:
-                json.dump(sorted_data, f, indent=4)
+            dump_json(sorted_data, OUTPUT_FILE)
+            HASH_FILE.write_text(fingerprint)
             print(f"Output saved to: {OUTPUT_FILE}")
         except IOError as e:
             print(f"ERROR saving file: {e}")
@@ -170,7 +287,7 @@ def main():
     print("\n" + "=" * 40)
     print("SUMMARY")
     print("=" * 40)
-    print(f"Total emails scanned: {len(emails)}")
+    print(f"Total emails scanned: {total_scanned}")
     print(f"Surveys extracted:    {len(sorted_data)}")
     print(f"Emails skipped:       {skipped}")
 